@@ -0,0 +1,133 @@
+import asyncio
+import contextlib
+import hashlib
+import heapq
+import itertools
+import json
+import math
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Lower values are admitted first
+PRIORITY_TEMPLATE = 0
+PRIORITY_GENERATIVE = 1
+
+class Overloaded(Exception):
+    """Raised when a gate's wait queue is full and the request should be shed"""
+
+    def __init__(self, gate: str, retry_after: int):
+        super().__init__(f"{gate} is overloaded, retry after {retry_after}s")
+        self.gate = gate
+        self.retry_after = retry_after
+
+class PriorityGate:
+    """Concurrency limit with a bounded wait queue, admitting by priority then arrival order"""
+
+    def __init__(self, name: str, limit: int, max_queue: Optional[int] = None, smoothing: float = 0.2):
+        self.name = name
+        self.limit = max(1, limit)
+        self.max_queue = max_queue
+        self.smoothing = smoothing
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.avg_wait = 0.0
+        self.avg_service = 1.0
+        self._waiters: List[list] = []
+        self._seq = itertools.count()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Rough seconds until a newly queued request would be served"""
+        return max(1, math.ceil(self.avg_service * (self.queued + 1) / self.limit))
+
+    async def acquire(self, priority: int) -> float:
+        """Wait for a slot and return the time spent queued, in seconds"""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self._record_admission(0.0)
+            return 0.0
+        if self.max_queue is not None and self.queued >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(self.name, self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        entry = [priority, next(self._seq), future]
+        heapq.heappush(self._waiters, entry)
+        start = time.perf_counter()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we were cancelled, pass it on
+                self.release()
+            elif entry in self._waiters:
+                # release() may already have popped and skipped our cancelled future
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            raise
+
+        waited = time.perf_counter() - start
+        self._record_admission(waited)
+        return waited
+
+    def _record_admission(self, waited: float) -> None:
+        self.admitted += 1
+        self.avg_wait += self.smoothing * (waited - self.avg_wait)
+
+    def release(self) -> None:
+        # Hand the slot straight to the next waiter so nobody can barge past the queue
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    @contextlib.asynccontextmanager
+    async def slot(self, priority: int):
+        waited = await self.acquire(priority)
+        start = time.perf_counter()
+        try:
+            yield waited
+        finally:
+            self.avg_service += self.smoothing * (time.perf_counter() - start - self.avg_service)
+            self.release()
+
+    def stats(self) -> Dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_queue_wait_ms": round(self.avg_wait * 1000, 1),
+            "avg_service_ms": round(self.avg_service * 1000, 1)
+        }
+
+def request_key(user_id: str, query: str, conversation_history: List[Dict]) -> str:
+    """Coalescing key for a chat request, scoped per user so personalised answers never leak"""
+    payload = json.dumps([user_id, query, conversation_history[-3:]], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class SingleFlight:
+    """Coalesce concurrent calls sharing a key into one in-flight computation"""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one caller disconnecting doesn't cancel the work for the others
+        return await asyncio.shield(task)
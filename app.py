@@ -1,3 +1,4 @@
+import os
 import streamlit as st
 import spacy
 from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM
@@ -8,23 +9,20 @@ from typing import List, Dict
 import time
 import sys
 from functools import lru_cache
+import html
+import uuid
+from collections import deque
 
-# Initial loading screen
-if 'ready' not in st.session_state:
-    st.title("NeoBank AI Assistant")
-    with st.status("Initializing banking assistant...", expanded=True) as status:
-        st.write("Loading core modules...")
-        time.sleep(0.5)
-        st.write("Setting up security...")
-        time.sleep(0.3)
-        st.write("Almost ready...")
-        time.sleep(0.2)
-        status.update(label="Ready!", state="complete")
-    st.session_state.ready = True
-    st.rerun()
+from inference_threads import InferenceLanes
+
+# Chat window: only the newest messages render live, older ones collapse behind a toggle
+# and anything beyond the session-state bound moves to a capped per-session archive
+LIVE_MESSAGES = 20
+MAX_HISTORY = 60
+ARCHIVE_LIMIT = 200
 
 # Custom CSS for chat interface
-st.markdown("""
+CHAT_CSS = """
 <style>
     .stChatInput {
         position: fixed;
@@ -86,8 +84,50 @@ st.markdown("""
         0%, 60%, 100% { transform: translateY(0); }
         30% { transform: translateY(-5px); }
     }
+    .archived-message {
+        padding: 0.6rem 1rem;
+        margin: 0.4rem 0;
+        border-radius: 12px;
+        white-space: pre-wrap;
+        opacity: 0.85;
+    }
+    .archived-message.user {
+        margin-left: 20%;
+        background-color: #E6F1FB;
+    }
+    .archived-message.assistant {
+        margin-right: 20%;
+        background-color: #F5F7FA;
+    }
+    .archived-message .banking-response {
+        white-space: normal;
+    }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# App Header with better UI
+HEADER_HTML = """
+<div style="background: linear-gradient(135deg, #0078D4 0%, #004E8C 100%);
+            color: white;
+            padding: 1.8rem;
+            border-radius: 12px;
+            margin-bottom: 1.8rem;
+            box-shadow: 0 4px 12px rgba(0,0,0,0.1);">
+    <div style="display: flex; align-items: center; gap: 15px;">
+        <div style="background: white; padding: 8px; border-radius: 50%;">
+            <svg width="30" height="30" viewBox="0 0 24 24" fill="none" xmlns="http://www.w3.org/2000/svg">
+                <path d="M12 2C6.48 2 2 6.48 2 12s4.48 10 10 10 10-4.48 10-10S17.52 2 12 2zm0 18c-4.41 0-8-3.59-8-8s3.59-8 8-8 8 3.59 8 8-3.59 8-8 8z" fill="#0078D4"/>
+                <path d="M12 6c-3.31 0-6 2.69-6 6s2.69 6 6 6 6-2.69 6-6-2.69-6-6-6zm0 10c-2.21 0-4-1.79-4-4s1.79-4 4-4 4 1.79 4 4-1.79 4-4 4z" fill="#0078D4"/>
+                <circle cx="12" cy="12" r="2" fill="#0078D4"/>
+            </svg>
+        </div>
+        <div>
+            <h1 style="margin:0; font-size: 28px;">NeoBank AI Assistant</h1>
+            <p style="margin:0; opacity:0.8; font-size: 14px;">Your intelligent banking companion</p>
+        </div>
+    </div>
+</div>
+"""
 
 # Initialize models with better error handling
 @st.cache_resource(ttl=3600, show_spinner="Loading AI models...")
@@ -113,6 +153,18 @@ def load_models():
         st.error(f"Error loading models: {str(e)}")
         return None
 
+# One set of core-pinned inference lanes shared by every session, so concurrent
+# generations split the CPU instead of each grabbing every core. Tuned with the same
+# INFERENCE_LANES / THREADS_PER_LANE variables as the backend
+@st.cache_resource
+def load_inference_lanes():
+    lanes = os.environ.get("INFERENCE_LANES")
+    threads_per_lane = os.environ.get("THREADS_PER_LANE")
+    return InferenceLanes(
+        int(lanes) if lanes else None,
+        int(threads_per_lane) if threads_per_lane else None
+    )
+
 # Lazy load banking model
 def load_banking_model():
     if 'banking_model' not in st.session_state:
@@ -339,7 +391,8 @@ def get_general_response(query: str, history: List[Dict]) -> str:
                 )
                 
                 if inputs.shape[1] > 0:
-                    outputs = st.session_state.banking_model.generate(
+                    outputs = inference_lanes.call(
+                        st.session_state.banking_model.generate,
                         inputs,
                         max_length=200,
                         pad_token_id=st.session_state.banking_tokenizer.eos_token_id,
@@ -364,7 +417,8 @@ def get_general_response(query: str, history: List[Dict]) -> str:
         
         if len(prompt_text) > 10:
             try:
-                result = conversation_model(
+                result = inference_lanes.call(
+                    conversation_model,
                     prompt_text,
                     max_length=200,
                     do_sample=True,
@@ -392,6 +446,44 @@ def get_time_of_day() -> str:
         return "evening"
     return "night"
 
+def make_message(role: str, content: str) -> Dict:
+    """Build a chat message, rendering its collapsed-history HTML once up front"""
+    # Only assistant cards are trusted HTML; user text is always escaped
+    is_html = role == "assistant" and "<div class='banking-response'>" in content
+    if is_html:
+        # Blank lines would end the HTML block when the collapsed history is parsed as markdown
+        body = "\n".join(line for line in content.splitlines() if line.strip())
+    else:
+        body = html.escape(content.strip()).replace("\n", "<br>")
+    return {
+        "role": role,
+        "content": content,
+        "is_html": is_html,
+        "html": f"<div class='archived-message {role}'>{body}</div>"
+    }
+
+# Kept in process memory rather than on disk so no banking data is ever written out. Older turns
+# are dropped past ARCHIVE_LIMIT, and once more than max_entries sessions have archived turns the
+# least recently used archive is evicted, whether or not that session is still active. The UI
+# reports how many turns were dropped (see archived_total)
+@st.cache_resource(max_entries=256, show_spinner=False)
+def session_archive(session_id: str) -> deque:
+    return deque(maxlen=ARCHIVE_LIMIT)
+
+def add_message(role: str, content: str):
+    """Append to the chat history, archiving the oldest turns once it outgrows MAX_HISTORY"""
+    messages = st.session_state.messages
+    messages.append(make_message(role, content))
+    overflow = len(messages) - MAX_HISTORY
+    if overflow > 0:
+        session_archive(st.session_state.session_id).extend(messages[:overflow])
+        st.session_state.archived_total += overflow
+        del messages[:overflow]
+
+def render_message(message: Dict):
+    with st.chat_message(message["role"]):
+        st.markdown(message["content"], unsafe_allow_html=message.get("is_html", False))
+
 # Initialize app
 if 'models' not in st.session_state:
     st.session_state.models = load_models()
@@ -400,36 +492,15 @@ if 'models' not in st.session_state:
 
 nlp = st.session_state.models['nlp']
 conversation_model = st.session_state.models['conversation_model']
+inference_lanes = load_inference_lanes()
 
-# App Header with better UI
-st.markdown("""
-<div style="background: linear-gradient(135deg, #0078D4 0%, #004E8C 100%);
-            color: white;
-            padding: 1.8rem;
-            border-radius: 12px;
-            margin-bottom: 1.8rem;
-            box-shadow: 0 4px 12px rgba(0,0,0,0.1);">
-    <div style="display: flex; align-items: center; gap: 15px;">
-        <div style="background: white; padding: 8px; border-radius: 50%;">
-            <svg width="30" height="30" viewBox="0 0 24 24" fill="none" xmlns="http://www.w3.org/2000/svg">
-                <path d="M12 2C6.48 2 2 6.48 2 12s4.48 10 10 10 10-4.48 10-10S17.52 2 12 2zm0 18c-4.41 0-8-3.59-8-8s3.59-8 8-8 8 3.59 8 8-3.59 8-8 8z" fill="#0078D4"/>
-                <path d="M12 6c-3.31 0-6 2.69-6 6s2.69 6 6 6 6-2.69 6-6-2.69-6-6-6zm0 10c-2.21 0-4-1.79-4-4s1.79-4 4-4 4 1.79 4 4-1.79 4-4 4z" fill="#0078D4"/>
-                <circle cx="12" cy="12" r="2" fill="#0078D4"/>
-            </svg>
-        </div>
-        <div>
-            <h1 style="margin:0; font-size: 28px;">NeoBank AI Assistant</h1>
-            <p style="margin:0; opacity:0.8; font-size: 14px;">Your intelligent banking companion</p>
-        </div>
-    </div>
-</div>
-""", unsafe_allow_html=True)
+st.markdown(CHAT_CSS + HEADER_HTML, unsafe_allow_html=True)
 
 # Initialize chat history
 if "messages" not in st.session_state:
-    st.session_state.messages = [{
-        "role": "assistant", 
-        "content": """
+    st.session_state.session_id = uuid.uuid4().hex
+    st.session_state.archived_total = 0
+    st.session_state.messages = [make_message("assistant", """
 👋 Hello there! I'm Neo, your AI banking assistant. I can help you with:
 
 • Checking account balances 💰  
@@ -440,16 +511,25 @@ if "messages" not in st.session_state:
 • Investment advice 📈  
 
 What would you like to do today?
-"""
-    }]
+""")]
 
-# Display chat messages
-for message in st.session_state.messages:
-    with st.chat_message(message["role"]):
-        if "<div class='banking-response'>" in message["content"]:
-            st.markdown(message["content"], unsafe_allow_html=True)
-        else:
-            st.markdown(message["content"])
+# Display chat messages: older turns collapse into a single pre-rendered block, loaded on demand
+archived_messages = session_archive(st.session_state.session_id)
+earlier_messages = st.session_state.messages[:-LIVE_MESSAGES]
+hidden_count = len(archived_messages) + len(earlier_messages)
+dropped_count = st.session_state.archived_total - len(archived_messages)
+if hidden_count or dropped_count:
+    caption = f"{hidden_count} earlier messages"
+    if dropped_count:
+        caption += f" · {dropped_count} older messages are no longer kept"
+    st.caption(caption)
+# A stable label keeps the toggle's identity (and its open state) as the count grows
+if hidden_count and st.toggle("Show earlier messages", key="show_earlier_messages"):
+    earlier_html = "".join(message["html"] for message in [*archived_messages, *earlier_messages])
+    st.markdown(earlier_html, unsafe_allow_html=True)
+
+for message in st.session_state.messages[-LIVE_MESSAGES:]:
+    render_message(message)
 
 # Chat input handler
 if prompt := st.chat_input("Type your message here..."):
@@ -458,7 +538,7 @@ if prompt := st.chat_input("Type your message here..."):
         st.stop()
     
     # Add user message
-    st.session_state.messages.append({"role": "user", "content": prompt})
+    add_message("user", prompt)
     with st.chat_message("user"):
         st.markdown(prompt)
     
@@ -482,7 +562,8 @@ if prompt := st.chat_input("Type your message here..."):
                             max_length=512,
                             truncation=True
                         )
-                        outputs = st.session_state.banking_model.generate(
+                        outputs = inference_lanes.call(
+                            st.session_state.banking_model.generate,
                             inputs,
                             max_length=200,
                             pad_token_id=st.session_state.banking_tokenizer.eos_token_id,
@@ -511,7 +592,7 @@ if prompt := st.chat_input("Type your message here..."):
                 ])
             
             # Add assistant response
-            st.session_state.messages.append({"role": "assistant", "content": response})
+            add_message("assistant", response)
             with st.chat_message("assistant"):
                 if "<div class='banking-response'>" in response:
                     st.markdown(response, unsafe_allow_html=True)
@@ -520,10 +601,7 @@ if prompt := st.chat_input("Type your message here..."):
                     
         except Exception as e:
             st.error(f"An error occurred: {str(e)}")
-            st.session_state.messages.append({
-                "role": "assistant",
-                "content": "Sorry, I'm having some technical difficulties. Please try again later."
-            })
+            add_message("assistant", "Sorry, I'm having some technical difficulties. Please try again later.")
 
 # Sidebar with quick actions
 with st.sidebar:
@@ -531,31 +609,19 @@ with st.sidebar:
     st.markdown("### 🚀 Quick Actions")
     
     if st.button("💰 Check Balance"):
-        st.session_state.messages.append({
-            "role": "user",
-            "content": "What's my account balance?"
-        })
+        add_message("user", "What's my account balance?")
         st.rerun()
     
     if st.button("📊 View Transactions"):
-        st.session_state.messages.append({
-            "role": "user",
-            "content": "Show me my recent transactions"
-        })
+        add_message("user", "Show me my recent transactions")
         st.rerun()
     
     if st.button("💳 Card Services"):
-        st.session_state.messages.append({
-            "role": "user",
-            "content": "Tell me about my credit card"
-        })
+        add_message("user", "Tell me about my credit card")
         st.rerun()
     
     if st.button("📤 Transfer Funds"):
-        st.session_state.messages.append({
-            "role": "user",
-            "content": "I want to transfer money"
-        })
+        add_message("user", "I want to transfer money")
         st.rerun()
     
     st.markdown("---")
@@ -0,0 +1,50 @@
+"""Measure the Streamlit rerun cost per chat interaction as the history grows
+
+Drives app.py headlessly with streamlit's AppTest. Models are swapped for a blank spaCy
+pipeline so the numbers reflect rendering, not inference:
+
+    python bench_chat_render.py --interactions 200 --every 25
+"""
+import argparse
+import statistics
+import time
+
+import spacy
+from streamlit.testing.v1 import AppTest
+
+PROMPTS = [
+    "What's my account balance?",
+    "Show me my recent transactions",
+    "Tell me about my credit card",
+    "What are my loan EMIs?"
+]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--interactions", type=int, default=200)
+    parser.add_argument("--every", type=int, default=25, help="report a bucket every N interactions")
+    args = parser.parse_args()
+
+    app = AppTest.from_file("app.py", default_timeout=60)
+    # Banking templates only need tokenisation, so skip loading the real models
+    app.session_state["models"] = {"nlp": spacy.blank("en"), "conversation_model": None}
+    app.run()
+
+    print(f"{'interactions':>12}{'history':>9}{'elements':>10}{'mean ms':>10}{'p95 ms':>9}")
+    timings = []
+    for i in range(1, args.interactions + 1):
+        app.chat_input[0].set_value(PROMPTS[i % len(PROMPTS)])
+        start = time.perf_counter()
+        app.run()
+        timings.append((time.perf_counter() - start) * 1000)
+        if app.exception:
+            raise SystemExit(f"app raised: {app.exception[0].message}")
+
+        if i % args.every == 0:
+            history = i * 2 + 1  # greeting plus a user and assistant turn per interaction
+            p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+            print(f"{i:>12}{history:>9}{len(app.markdown):>10}{statistics.mean(timings):>10.1f}{p95:>9.1f}")
+            timings = []
+
+if __name__ == "__main__":
+    main()
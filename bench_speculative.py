@@ -0,0 +1,74 @@
+"""Compare plain DialoGPT-medium generation against speculative decoding with DialoGPT-small
+
+    python bench_speculative.py --lookahead 2 4 6 --runs 3
+"""
+import argparse
+import time
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+
+from speculative import SpeculativeDecoder
+
+PROMPTS = [
+    "What's my account balance?",
+    "How do I transfer money to a friend?",
+    "Can you explain how EMI on a home loan works?",
+    "I lost my debit card, what should I do?",
+    "What is a good way to start saving money every month?"
+]
+
+def run(generator, tokenizer, args) -> float:
+    """Generate for every prompt and return tokens per second"""
+    tokens, elapsed = 0, 0.0
+    for _ in range(args.runs):
+        for prompt in PROMPTS:
+            inputs = tokenizer.encode(prompt + tokenizer.eos_token, return_tensors="pt")
+            start = time.perf_counter()
+            outputs = generator.generate(
+                inputs,
+                max_new_tokens=args.max_new_tokens,
+                min_new_tokens=args.max_new_tokens,
+                pad_token_id=tokenizer.eos_token_id,
+                do_sample=args.sample,
+                **({"top_p": 0.95, "temperature": 0.7} if args.sample else {})
+            )
+            elapsed += time.perf_counter() - start
+            tokens += outputs.shape[-1] - inputs.shape[-1]
+    return tokens / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lookahead", type=int, nargs="+", default=[2, 4, 6, 8])
+    parser.add_argument("--runs", type=int, default=2)
+    parser.add_argument("--max-new-tokens", type=int, default=48)
+    parser.add_argument("--sample", action="store_true", help="sample like main.py instead of greedy decoding")
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    tokenizer = AutoTokenizer.from_pretrained("microsoft/DialoGPT-medium")
+    target = AutoModelForCausalLM.from_pretrained("microsoft/DialoGPT-medium").eval()
+    draft = AutoModelForCausalLM.from_pretrained("microsoft/DialoGPT-small").eval()
+
+    # Warm up both models so the first measurement doesn't pay for lazy initialisation
+    run(target, tokenizer, argparse.Namespace(**{**vars(args), "runs": 1, "max_new_tokens": 4}))
+    run(draft, tokenizer, argparse.Namespace(**{**vars(args), "runs": 1, "max_new_tokens": 4}))
+
+    baseline = run(target, tokenizer, args)
+    small = run(draft, tokenizer, args)
+    print(f"{'mode':<22}{'tok/s':>9}{'speedup':>9}{'accept~':>9}{'tok/pass':>10}")
+    print(f"{'medium generate()':<22}{baseline:>9.2f}{1.0:>9.2f}{'-':>9}{'-':>10}")
+    print(f"{'small generate()':<22}{small:>9.2f}{small / baseline:>9.2f}{'-':>9}{'-':>10}")
+
+    for lookahead in args.lookahead:
+        decoder = SpeculativeDecoder(target, draft, lookahead=lookahead)
+        speed = run(decoder, tokenizer, args)
+        stats = decoder.stats()
+        decoder.close()
+        print(
+            f"{f'speculative k={lookahead}':<22}{speed:>9.2f}{speed / baseline:>9.2f}"
+            f"{stats['acceptance_rate_estimate']:>9.2f}{stats['tokens_per_pass']:>10.2f}"
+        )
+
+if __name__ == "__main__":
+    main()
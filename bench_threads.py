@@ -0,0 +1,90 @@
+"""Sweep inference lane layouts and report throughput/latency for concurrent generations
+
+Every configuration gets the same burst of concurrent requests. The baseline is an
+unmanaged thread pool where each generate() uses torch's default thread count:
+
+    python bench_threads.py --model microsoft/DialoGPT-small --requests 16
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+
+from inference_threads import InferenceLanes, available_cores
+
+PROMPTS = [
+    "What's my account balance?",
+    "How do I transfer money to a friend?",
+    "Can you explain how EMI on a home loan works?",
+    "I lost my debit card, what should I do?"
+]
+
+def burst(executor, model, tokenizer, args):
+    """Submit every request at once; return (requests/sec, mean latency, p95 latency)"""
+    def one(prompt, submitted):
+        inputs = tokenizer.encode(prompt + tokenizer.eos_token, return_tensors="pt")
+        with torch.no_grad():
+            model.generate(
+                inputs,
+                max_new_tokens=args.max_new_tokens,
+                min_new_tokens=args.max_new_tokens,
+                pad_token_id=tokenizer.eos_token_id,
+                do_sample=False
+            )
+        return time.perf_counter() - submitted
+
+    start = time.perf_counter()
+    futures = [executor.submit(one, PROMPTS[i % len(PROMPTS)], time.perf_counter()) for i in range(args.requests)]
+    wait(futures)
+    elapsed = time.perf_counter() - start
+    latencies = sorted(f.result() for f in futures)
+    p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+    return args.requests / elapsed, statistics.mean(latencies), p95
+
+def configurations(cores: int):
+    threads = 1
+    while threads <= cores:
+        yield cores // threads, threads
+        threads *= 2
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="microsoft/DialoGPT-small")
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=4, help="worker threads for the unmanaged baseline")
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    model = AutoModelForCausalLM.from_pretrained(args.model).eval()
+    cores = len(available_cores())
+    print(f"{cores} cores available, {args.requests} requests x {args.max_new_tokens} tokens\n")
+
+    # Baseline first: creating lanes resizes torch's global thread pools
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        burst(pool, model, tokenizer, argparse.Namespace(**{**vars(args), "requests": 2}))
+        results = [(f"unmanaged x{args.concurrency}", *burst(pool, model, tokenizer, args))]
+
+    for lanes, threads in configurations(cores):
+        executor = InferenceLanes(lanes, threads)
+        burst(executor, model, tokenizer, argparse.Namespace(**{**vars(args), "requests": lanes}))
+        results.append((f"{lanes} lanes x {threads} threads", *burst(executor, model, tokenizer, args)))
+        executor.shutdown()
+
+    print(f"{'configuration':<26}{'req/s':>8}{'mean s':>9}{'p95 s':>9}")
+    for name, throughput, mean, p95 in results:
+        print(f"{name:<26}{throughput:>8.2f}{mean:>9.2f}{p95:>9.2f}")
+
+    best_throughput = max(results, key=lambda r: r[1])
+    best_latency = min(results, key=lambda r: r[3])
+    # Best trade-off: lowest p95 among configurations within 10% of the top throughput
+    balanced = min((r for r in results if r[1] >= 0.9 * best_throughput[1]), key=lambda r: r[3])
+    print(f"\nbest throughput: {best_throughput[0]}")
+    print(f"best p95 latency: {best_latency[0]}")
+    print(f"recommended: {balanced[0]}")
+
+if __name__ == "__main__":
+    main()
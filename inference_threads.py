@@ -0,0 +1,106 @@
+import os
+os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')  # Tokenizer threads would contend with torch's
+
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import torch
+
+def available_cores() -> List[int]:
+    """CPU ids this process may run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def pin_current_thread(cpus: List[int]):
+    """Restrict the calling thread (and threads it spawns) to `cpus`, where the OS supports it"""
+    if cpus and hasattr(os, "sched_setaffinity"):
+        # On Linux pid 0 pins just the calling thread; torch's intra-op threads inherit it
+        os.sched_setaffinity(0, cpus)
+
+class InferenceLanes(Executor):
+    """Partition the CPU cores into lanes, each served by one worker thread pinned to its own cores
+
+    Every lane runs one request at a time with `threads_per_lane` intra-op threads, so concurrent
+    generations stop oversubscribing the machine. Requests go to the lane with the least pending work.
+    `reserved_cores` are kept out of the lanes (see `reserved`) for work that must not wait on generation.
+    """
+
+    def __init__(self, lanes: Optional[int] = None, threads_per_lane: Optional[int] = None,
+                 interop_threads: int = 1, reserved_cores: int = 0):
+        cores = available_cores()
+        # Never reserve every core, the lanes need at least one
+        reserved_cores = min(max(0, reserved_cores), len(cores) - 1)
+        self.reserved = cores[len(cores) - reserved_cores:] if reserved_cores else []
+        cores = cores[:len(cores) - reserved_cores]
+        if threads_per_lane is None:
+            threads_per_lane = max(1, len(cores) // lanes) if lanes else min(4, len(cores))
+        if lanes is None:
+            lanes = max(1, len(cores) // threads_per_lane)
+        self.threads_per_lane = max(1, threads_per_lane)
+        # Hand out contiguous core blocks, wrapping around if the config oversubscribes the host
+        self.lane_cores = [
+            [cores[(lane * self.threads_per_lane + i) % len(cores)] for i in range(self.threads_per_lane)]
+            for lane in range(max(1, lanes))
+        ]
+
+        # Lanes share one process, so size the global pools to a single lane
+        torch.set_num_threads(self.threads_per_lane)
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            pass  # Already fixed once inter-op work has started in this process
+
+        self._lock = threading.Lock()
+        self._pending = [0] * len(self.lane_cores)
+        self._completed = [0] * len(self.lane_cores)
+        self._executors = [
+            ThreadPoolExecutor(
+                max_workers=1,
+                thread_name_prefix=f"inference-lane{lane}",
+                initializer=self._init_lane,
+                initargs=(cpus,)
+            )
+            for lane, cpus in enumerate(self.lane_cores)
+        ]
+
+    @property
+    def lanes(self) -> int:
+        return len(self.lane_cores)
+
+    def _init_lane(self, cpus: List[int]):
+        pin_current_thread(cpus)
+        torch.set_num_threads(len(cpus))
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        with self._lock:
+            lane = min(range(self.lanes), key=self._pending.__getitem__)
+            self._pending[lane] += 1
+        future = self._executors[lane].submit(fn, *args, **kwargs)
+        future.add_done_callback(lambda _: self._finish(lane))
+        return future
+
+    def _finish(self, lane: int):
+        with self._lock:
+            self._pending[lane] -= 1
+            self._completed[lane] += 1
+
+    def call(self, fn: Callable, *args, **kwargs):
+        """Run `fn` on a lane and block until it finishes"""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        for executor in self._executors:
+            executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "lanes": self.lanes,
+                "threads_per_lane": self.threads_per_lane,
+                "lane_cores": self.lane_cores,
+                "reserved_cores": self.reserved,
+                "pending": list(self._pending),
+                "completed": list(self._completed)
+            }
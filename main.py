@@ -2,17 +2,61 @@ import os
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'  # Suppress TensorFlow logging
 os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'  # Disable oneDNN custom operations
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 import spacy
 from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM
 from datetime import datetime, timedelta
+from concurrent.futures import Executor, ThreadPoolExecutor
+import asyncio
+import contextlib
 import random
-from typing import List, Dict
+from typing import Any, Callable, List, Dict, Optional, Tuple
 import torch
 
+from admission import PRIORITY_GENERATIVE, PRIORITY_TEMPLATE, Overloaded, PriorityGate, SingleFlight, request_key
+from inference_threads import InferenceLanes, available_cores, pin_current_thread
+from speculative import SpeculativeDecoder
+
 app = FastAPI()
 
+# Admission control: per-model generation limits with a bounded queue, plus one shared gate that
+# meters every inference job (template lookups on the worker pool, generations on the lanes)
+# against INFERENCE_SLOTS. Once that budget is spent, queued template intents are admitted
+# ahead of queued generative fallback
+MODEL_CONCURRENCY = {
+    "dialogpt": int(os.environ.get("DIALOGPT_CONCURRENCY", "1")),
+    "blenderbot": int(os.environ.get("BLENDERBOT_CONCURRENCY", "1"))
+}
+GENERATION_QUEUE_SIZE = int(os.environ.get("GENERATION_QUEUE_SIZE", "8"))
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", "4"))
+INFERENCE_SLOTS = int(os.environ.get("INFERENCE_SLOTS", str(INFERENCE_WORKERS)))
+MAX_PENDING_REQUESTS = int(os.environ.get("MAX_PENDING_REQUESTS", "64"))
+DEGRADE_ON_OVERLOAD = os.environ.get("DEGRADE_ON_OVERLOAD", "1") == "1"
+
+# Generation runs on core-pinned lanes so concurrent generate() calls don't oversubscribe the CPU.
+# The model gates cap concurrent generations at sum(MODEL_CONCURRENCY), so by default that is the
+# lane count and the cores are split evenly between them; extra lanes would only sit idle.
+# TEMPLATE_CORES are held back from the lanes and given to the template pool, so balance/card/loan
+# lookups keep CPU headroom while every lane is generating
+INFERENCE_LANES = int(os.environ.get("INFERENCE_LANES", str(sum(MODEL_CONCURRENCY.values()))))
+THREADS_PER_LANE = int(os.environ["THREADS_PER_LANE"]) if "THREADS_PER_LANE" in os.environ else None
+TEMPLATE_CORES = int(os.environ.get("TEMPLATE_CORES", "1" if len(available_cores()) > INFERENCE_LANES else "0"))
+
+inference_lanes = InferenceLanes(INFERENCE_LANES, THREADS_PER_LANE, reserved_cores=TEMPLATE_CORES)
+inference_executor = ThreadPoolExecutor(
+    max_workers=INFERENCE_WORKERS,
+    thread_name_prefix="inference",
+    initializer=pin_current_thread,
+    initargs=(inference_lanes.reserved,)
+)
+inference_gate = PriorityGate("inference", INFERENCE_SLOTS, max_queue=MAX_PENDING_REQUESTS)
+model_gates = {
+    name: PriorityGate(name, limit, max_queue=GENERATION_QUEUE_SIZE)
+    for name, limit in MODEL_CONCURRENCY.items()
+}
+degraded_responses = {"count": 0}
+
 # Load NLP models
 try:
     nlp = spacy.load("en_core_web_md")
@@ -39,6 +83,21 @@ except Exception as e:
     banking_tokenizer = AutoTokenizer.from_pretrained("microsoft/DialoGPT-small")
     banking_model = AutoModelForCausalLM.from_pretrained("microsoft/DialoGPT-small")
 
+# Optional speculative decoding: DialoGPT-small drafts tokens for DialoGPT-medium to verify
+SPECULATIVE_DECODING = os.environ.get("SPECULATIVE_DECODING", "0") == "1"
+SPECULATIVE_LOOKAHEAD = int(os.environ.get("SPECULATIVE_LOOKAHEAD", "5"))
+speculative_decoder = None
+if SPECULATIVE_DECODING and banking_model.config.name_or_path == "microsoft/DialoGPT-medium":
+    try:
+        speculative_decoder = SpeculativeDecoder(
+            banking_model,
+            AutoModelForCausalLM.from_pretrained("microsoft/DialoGPT-small"),
+            lookahead=SPECULATIVE_LOOKAHEAD
+        )
+    except Exception as e:
+        print(f"Error loading draft model, speculative decoding disabled: {e}")
+banking_generator = speculative_decoder or banking_model
+
 # Data models
 class Query(BaseModel):
     query: str
@@ -65,40 +124,36 @@ user_accounts = {
     }
 }
 
-def get_contextual_response(query: str, conversation_history: List[Dict]) -> str:
-    """Generate contextual response using NLP models"""
-    try:
-        # Try banking-specific model first
-        banking_input = "\n".join([msg["content"] for msg in conversation_history[-3:]]) + "\n" + query
-        inputs = banking_tokenizer.encode(banking_input + banking_tokenizer.eos_token, return_tensors='pt')
-        
-        outputs = banking_model.generate(
-            inputs,
-            max_length=200,
-            pad_token_id=banking_tokenizer.eos_token_id,
-            no_repeat_ngram_size=3,
-            do_sample=True,
-            top_k=50,
-            top_p=0.95,
-            temperature=0.7
-        )
-        banking_response = banking_tokenizer.decode(outputs[0], skip_special_tokens=True)
-        
-        if any(word in banking_response.lower() for word in ["account", "balance", "loan", "card", "transaction"]):
-            return banking_response
-        
-        # Fall back to general conversation model
-        conv_history = "\n".join([f"{msg['role']}: {msg['content']}" for msg in conversation_history[-3:]])
-        return conversation_model(
-            f"Conversation history:\n{conv_history}\nUser: {query}\nAssistant:",
-            max_length=200,
-            do_sample=True,
-            temperature=0.7,
-            top_p=0.9
-        )[0]['generated_text']
-    except Exception as e:
-        print(f"Error in generating response: {e}")
-        return "I'm having trouble understanding that. Could you rephrase your question?"
+def generate_banking_reply(query: str, conversation_history: List[Dict]) -> str:
+    """Generate a reply with the banking-specific model"""
+    banking_input = "\n".join([msg["content"] for msg in conversation_history[-3:]]) + "\n" + query
+    inputs = banking_tokenizer.encode(banking_input + banking_tokenizer.eos_token, return_tensors='pt')
+    
+    outputs = banking_generator.generate(
+        inputs,
+        max_length=200,
+        pad_token_id=banking_tokenizer.eos_token_id,
+        no_repeat_ngram_size=3,
+        do_sample=True,
+        top_k=50,
+        top_p=0.95,
+        temperature=0.7
+    )
+    return banking_tokenizer.decode(outputs[0], skip_special_tokens=True)
+
+def is_banking_reply(response: str) -> bool:
+    return any(word in response.lower() for word in ["account", "balance", "loan", "card", "transaction"])
+
+def generate_conversation_reply(query: str, conversation_history: List[Dict]) -> str:
+    """Generate a reply with the general conversation model"""
+    conv_history = "\n".join([f"{msg['role']}: {msg['content']}" for msg in conversation_history[-3:]])
+    return conversation_model(
+        f"Conversation history:\n{conv_history}\nUser: {query}\nAssistant:",
+        max_length=200,
+        do_sample=True,
+        temperature=0.7,
+        top_p=0.9
+    )[0]['generated_text']
 
 def process_banking_query(query: str, user_id: str) -> str:
     """Process specific banking queries"""
@@ -147,37 +202,113 @@ def process_banking_query(query: str, user_id: str) -> str:
     
     return None
 
+inflight_requests = SingleFlight()
+
+def get_personalised_reply(query: str, user_id: str) -> Optional[str]:
+    """Canned replies for thanks and greetings, which never need a model"""
+    user = user_accounts.get(user_id, user_accounts["user123"])
+    if any(word in query.lower() for word in ["thank", "thanks", "appreciate"]):
+        return random.choice([
+            f"You're welcome, {user['name']}! 😊",
+            f"Happy to help, {user['name']}!",
+            f"My pleasure, {user['name']}! Is there anything else I can assist you with?"
+        ])
+    elif any(word in query.lower() for word in ["hi", "hello", "hey"]):
+        return random.choice([
+            f"Hello {user['name']}! How can I assist you with your banking today?",
+            f"Hi there {user['name']}! What banking service can I help you with?",
+            f"Good {get_time_of_day()}, {user['name']}! How may I assist you?"
+        ])
+    return None
+
+SIMPLIFIED_RESPONSE = (
+    "I'm handling a lot of requests right now, so I can only give quick answers. "
+    "I can still help with your account balance, cards and loans straight away, "
+    "or you can try again in a moment."
+)
+
+async def run_gated(gates: List[PriorityGate], priority: int, executor: Executor, func: Callable, *args) -> Tuple[Any, float]:
+    """Run a blocking function on `executor` once every gate admits it"""
+    async with contextlib.AsyncExitStack() as stack:
+        waited = 0.0
+        for gate in gates:
+            waited += await stack.enter_async_context(gate.slot(priority))
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, func, *args), waited
+
+async def build_chat_response(query: Query) -> Dict:
+    """Route a query through the banking templates, falling back to conversational AI"""
+    # Template intents jump the shared inference queue ahead of generative traffic
+    banking_response, queue_wait = await run_gated(
+        [inference_gate], PRIORITY_TEMPLATE, inference_executor, process_banking_query, query.query, query.user_id
+    )
+    if banking_response:
+        return {"response": banking_response, "queue_wait_ms": round(queue_wait * 1000, 1)}
+    
+    personalised = get_personalised_reply(query.query, query.user_id)
+    if personalised:
+        return {"response": personalised, "queue_wait_ms": round(queue_wait * 1000, 1)}
+    
+    # Fall back to conversational AI
+    try:
+        response, waited = await run_gated(
+            [model_gates["dialogpt"], inference_gate], PRIORITY_GENERATIVE, inference_lanes,
+            generate_banking_reply, query.query, query.conversation_history
+        )
+        queue_wait += waited
+        if not is_banking_reply(response):
+            try:
+                response, waited = await run_gated(
+                    [model_gates["blenderbot"], inference_gate], PRIORITY_GENERATIVE, inference_lanes,
+                    generate_conversation_reply, query.query, query.conversation_history
+                )
+                queue_wait += waited
+            except Overloaded:
+                pass  # Fallback model is busy, the DialoGPT reply is better than nothing
+    except Overloaded:
+        if not DEGRADE_ON_OVERLOAD:
+            raise
+        # Skip generation rather than letting the queue grow into a latency cliff
+        degraded_responses["count"] += 1
+        return {"response": SIMPLIFIED_RESPONSE, "queue_wait_ms": round(queue_wait * 1000, 1), "degraded": True}
+    except Exception as e:
+        print(f"Error in generating response: {e}")
+        response = "I'm having trouble understanding that. Could you rephrase your question?"
+    
+    return {"response": response, "queue_wait_ms": round(queue_wait * 1000, 1)}
+
 @app.post("/chat")
 async def chat(query: Query):
     try:
-        # First try banking-specific responses
-        banking_response = process_banking_query(query.query, query.user_id)
-        if banking_response:
-            return {"response": banking_response}
-        
-        # Fall back to conversational AI
-        contextual_response = get_contextual_response(query.query, query.conversation_history)
-        
-        # Personalize responses
-        user = user_accounts.get(query.user_id, user_accounts["user123"])
-        if any(word in query.query.lower() for word in ["thank", "thanks", "appreciate"]):
-            contextual_response = random.choice([
-                f"You're welcome, {user['name']}! 😊",
-                f"Happy to help, {user['name']}!",
-                f"My pleasure, {user['name']}! Is there anything else I can assist you with?"
-            ])
-        elif any(word in query.query.lower() for word in ["hi", "hello", "hey"]):
-            contextual_response = random.choice([
-                f"Hello {user['name']}! How can I assist you with your banking today?",
-                f"Hi there {user['name']}! What banking service can I help you with?",
-                f"Good {get_time_of_day()}, {user['name']}! How may I assist you?"
-            ])
-        
-        return {"response": contextual_response}
+        # Identical concurrent requests (quick actions, common questions) share one computation
+        key = request_key(query.user_id, query.query, query.conversation_history)
+        return await inflight_requests.do(key, lambda: build_chat_response(query))
+    except Overloaded as e:
+        raise HTTPException(
+            status_code=503,
+            detail="The assistant is busy right now, please retry shortly.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         print(f"Error in chat endpoint: {e}")
         return {"response": "Sorry, I'm experiencing technical difficulties. Please try again later."}
 
+@app.get("/admission")
+async def admission_stats():
+    return {
+        "inference": inference_gate.stats(),
+        "lanes": inference_lanes.stats(),
+        "models": {name: gate.stats() for name, gate in model_gates.items()},
+        "degraded_responses": degraded_responses["count"],
+        "coalesced_in_flight": len(inflight_requests)
+    }
+
+@app.get("/speculative")
+async def speculative_stats():
+    if speculative_decoder is None:
+        return {"enabled": False}
+    return {"enabled": True, **speculative_decoder.stats()}
+
 def get_time_of_day() -> str:
     hour = datetime.now().hour
     if 5 <= hour < 12:
@@ -0,0 +1,83 @@
+import threading
+import time
+from typing import Dict
+
+def estimate_accepted(new_tokens: int, drafted: int, verify_passes: int) -> int:
+    """Estimate how many draft tokens the target accepted, from forward-pass counts
+
+    Each verification pass normally yields the accepted draft tokens plus one token of the
+    target's own, so accepted ~= new_tokens - verify_passes. When the last round is cut short
+    by EOS or max_length, the tokens it accepted but never emitted are missed, so the
+    estimate can come out low.
+    """
+    return min(drafted, max(0, new_tokens - verify_passes))
+
+class SpeculativeDecoder:
+    """Assisted decoding: a small draft model proposes tokens and the target verifies them in one forward pass
+
+    Draft and target must share a tokenizer (e.g. DialoGPT-small drafting for DialoGPT-medium).
+    transformers does not report acceptance, so it is estimated from forward-pass counts on
+    both models (see `estimate_accepted`).
+    """
+
+    def __init__(self, target_model, draft_model, lookahead: int = 5):
+        self.target_model = target_model
+        self.draft_model = draft_model
+        self.lookahead = lookahead
+        # Keep the lookahead fixed instead of letting transformers' heuristic schedule adjust it
+        self.draft_model.generation_config.num_assistant_tokens = lookahead
+        self.draft_model.generation_config.num_assistant_tokens_schedule = "constant"
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._totals = {"calls": 0, "new_tokens": 0, "drafted": 0, "accepted": 0, "verify_passes": 0, "seconds": 0.0}
+        self._hooks = [
+            target_model.register_forward_hook(self._counter("verify_passes")),
+            draft_model.register_forward_hook(self._counter("drafted"))
+        ]
+
+    def _counter(self, name: str):
+        def hook(module, inputs, output):
+            counts = getattr(self._local, "counts", None)
+            if counts is not None:
+                counts[name] += 1
+        return hook
+
+    def close(self) -> None:
+        """Detach the counting hooks, leaving both models as they were"""
+        for hook in self._hooks:
+            hook.remove()
+        self._hooks = []
+
+    def generate(self, inputs, **kwargs):
+        """Drop-in replacement for `target_model.generate` (batch size 1)"""
+        self._local.counts = {"drafted": 0, "verify_passes": 0}
+        start = time.perf_counter()
+        try:
+            outputs = self.target_model.generate(inputs, assistant_model=self.draft_model, **kwargs)
+        finally:
+            counts, self._local.counts = self._local.counts, None
+        elapsed = time.perf_counter() - start
+
+        new_tokens = outputs.shape[-1] - inputs.shape[-1]
+        accepted = estimate_accepted(new_tokens, counts["drafted"], counts["verify_passes"])
+        with self._lock:
+            self._totals["calls"] += 1
+            self._totals["new_tokens"] += new_tokens
+            self._totals["drafted"] += counts["drafted"]
+            self._totals["accepted"] += accepted
+            self._totals["verify_passes"] += counts["verify_passes"]
+            self._totals["seconds"] += elapsed
+        return outputs
+
+    def stats(self) -> Dict:
+        """Running totals; `accepted` and `acceptance_rate_estimate` are estimates, not exact counts"""
+        with self._lock:
+            totals = dict(self._totals)
+        return {
+            **totals,
+            "lookahead": self.lookahead,
+            "acceptance_rate_estimate": round(totals["accepted"] / totals["drafted"], 3) if totals["drafted"] else 0.0,
+            "tokens_per_pass": round(totals["new_tokens"] / totals["verify_passes"], 2) if totals["verify_passes"] else 0.0,
+            "tokens_per_second": round(totals["new_tokens"] / totals["seconds"], 2) if totals["seconds"] else 0.0
+        }
@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+from admission import PRIORITY_GENERATIVE, PRIORITY_TEMPLATE, Overloaded, PriorityGate, SingleFlight, request_key
+
+def test_template_admitted_before_queued_generative():
+    async def scenario():
+        gate = PriorityGate("workers", 1)
+        order = []
+
+        async def job(name, priority):
+            async with gate.slot(priority):
+                order.append(name)
+                await asyncio.sleep(0)
+
+        await gate.acquire(PRIORITY_GENERATIVE)
+        jobs = [
+            asyncio.create_task(job("generative", PRIORITY_GENERATIVE)),
+            asyncio.create_task(job("template", PRIORITY_TEMPLATE))
+        ]
+        await asyncio.sleep(0)
+        gate.release()
+        await asyncio.gather(*jobs)
+        return order
+
+    assert asyncio.run(scenario()) == ["template", "generative"]
+
+def test_overloaded_when_queue_full():
+    async def scenario():
+        gate = PriorityGate("dialogpt", 1, max_queue=2)
+        await gate.acquire(PRIORITY_GENERATIVE)
+        waiters = [asyncio.create_task(gate.acquire(PRIORITY_GENERATIVE)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as excinfo:
+            await gate.acquire(PRIORITY_GENERATIVE)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        return gate, excinfo.value
+
+    gate, error = asyncio.run(scenario())
+    assert error.gate == "dialogpt"
+    # One slot with two queued and the default 1s service estimate: ceil(1.0 * 3 / 1)
+    assert error.retry_after == 3
+    assert gate.rejected == 1
+
+def test_retry_after_scales_with_queue_and_limit():
+    gate = PriorityGate("blenderbot", 2)
+    gate.avg_service = 2.5
+    assert gate.retry_after() == 2  # ceil(2.5 * 1 / 2)
+    gate._waiters = [[PRIORITY_GENERATIVE, i, None] for i in range(3)]
+    assert gate.retry_after() == 5  # ceil(2.5 * 4 / 2)
+
+def test_cancel_while_queued_frees_the_queue():
+    async def scenario():
+        gate = PriorityGate("workers", 1)
+        await gate.acquire(PRIORITY_GENERATIVE)
+        waiter = asyncio.create_task(gate.acquire(PRIORITY_GENERATIVE))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert gate.queued == 0
+        gate.release()
+        return gate
+
+    assert asyncio.run(scenario()).active == 0
+
+def test_cancel_racing_release_raises_cancelled():
+    async def scenario():
+        gate = PriorityGate("workers", 1)
+        await gate.acquire(PRIORITY_GENERATIVE)
+        waiter = asyncio.create_task(gate.acquire(PRIORITY_GENERATIVE))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        gate.release()  # Pops the cancelled waiter before its handler runs
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return gate
+
+    gate = asyncio.run(scenario())
+    assert gate.active == 0
+    assert gate.queued == 0
+
+def test_single_flight_coalesces_identical_keys():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+
+        async def compute(key):
+            calls.append(key)
+            await asyncio.sleep(0.01)
+            return f"answer for {key}"
+
+        results = await asyncio.gather(
+            flight.do("user123:balance", lambda: compute("user123:balance")),
+            flight.do("user123:balance", lambda: compute("user123:balance")),
+            flight.do("user456:balance", lambda: compute("user456:balance"))
+        )
+        return flight, calls, results
+
+    flight, calls, results = asyncio.run(scenario())
+    assert calls == ["user123:balance", "user456:balance"]
+    assert results == ["answer for user123:balance"] * 2 + ["answer for user456:balance"]
+    assert len(flight) == 0
+
+def test_single_flight_caller_cancel_does_not_cancel_shared_work():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def compute():
+            await asyncio.sleep(0.01)
+            return "done"
+
+        first = asyncio.create_task(flight.do("key", compute))
+        second = asyncio.create_task(flight.do("key", compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == "done"
+
+def test_request_key_is_stable_for_identical_requests():
+    history = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "Hello!"}]
+    assert request_key("user123", "What's my balance?", history) == request_key("user123", "What's my balance?", list(history))
+
+def test_request_key_is_per_user():
+    assert request_key("user123", "What's my balance?", []) != request_key("user456", "What's my balance?", [])
+
+def test_request_key_covers_recent_history():
+    earlier = [{"role": "user", "content": "Tell me about my loans"}]
+    assert request_key("user123", "And the EMI?", []) != request_key("user123", "And the EMI?", earlier)
+    # Only the last three turns feed the models, so older turns don't split the key
+    recent = [{"role": "user", "content": str(i)} for i in range(3)]
+    assert request_key("user123", "ok", earlier + recent) == request_key("user123", "ok", recent)
@@ -0,0 +1,80 @@
+from types import SimpleNamespace
+
+from speculative import SpeculativeDecoder, estimate_accepted
+
+class StubHandle:
+    def __init__(self, hooks, hook):
+        self.hooks, self.hook = hooks, hook
+
+    def remove(self):
+        self.hooks.remove(self.hook)
+
+class StubModel:
+    """Just enough of a transformers model for SpeculativeDecoder: forward hooks and generate()"""
+
+    def __init__(self, rounds=()):
+        self.generation_config = SimpleNamespace()
+        self.hooks = []
+        # Draft tokens accepted in each verification round of the scripted generate()
+        self.rounds = rounds
+
+    def register_forward_hook(self, hook):
+        self.hooks.append(hook)
+        return StubHandle(self.hooks, hook)
+
+    def forward(self):
+        for hook in list(self.hooks):
+            hook(self, (), None)
+
+    def generate(self, inputs, assistant_model, max_new_tokens=None):
+        lookahead = assistant_model.generation_config.num_assistant_tokens
+        new_tokens = 0
+        for accepted in self.rounds:
+            for _ in range(lookahead):
+                assistant_model.forward()
+            self.forward()
+            new_tokens += accepted + 1
+        if max_new_tokens is not None:
+            new_tokens = min(new_tokens, max_new_tokens)
+        return SimpleNamespace(shape=(1, inputs.shape[-1] + new_tokens))
+
+PROMPT = SimpleNamespace(shape=(1, 7))
+
+def test_counts_match_scripted_rounds():
+    decoder = SpeculativeDecoder(StubModel(rounds=[5, 2, 0]), StubModel(), lookahead=5)
+    decoder.generate(PROMPT)
+
+    stats = decoder.stats()
+    assert stats["calls"] == 1
+    assert stats["drafted"] == 15
+    assert stats["verify_passes"] == 3
+    assert stats["new_tokens"] == 10
+    assert stats["accepted"] == 7
+    assert stats["acceptance_rate_estimate"] == round(7 / 15, 3)
+    assert stats["tokens_per_pass"] == round(10 / 3, 2)
+
+def test_truncated_final_round_underestimates_acceptance():
+    decoder = SpeculativeDecoder(StubModel(rounds=[4, 4]), StubModel(), lookahead=4)
+    decoder.generate(PROMPT, max_new_tokens=6)
+
+    # 8 draft tokens were accepted, but only 6 tokens came out of 2 passes
+    assert decoder.stats()["accepted"] == 4
+
+def test_estimate_is_clamped_to_drafted_tokens():
+    assert estimate_accepted(new_tokens=12, drafted=5, verify_passes=2) == 5
+    assert estimate_accepted(new_tokens=1, drafted=5, verify_passes=2) == 0
+
+def test_forward_passes_outside_generate_are_not_counted():
+    target, draft = StubModel(rounds=[3]), StubModel()
+    decoder = SpeculativeDecoder(target, draft, lookahead=3)
+    target.forward()
+    draft.forward()
+    assert decoder.stats()["verify_passes"] == 0
+    assert decoder.stats()["drafted"] == 0
+
+def test_close_detaches_hooks():
+    target, draft = StubModel(), StubModel()
+    decoder = SpeculativeDecoder(target, draft, lookahead=2)
+    decoder.close()
+    assert target.hooks == [] and draft.hooks == []
+    assert draft.generation_config.num_assistant_tokens_schedule == "constant"